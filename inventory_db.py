@@ -0,0 +1,279 @@
+import sqlite3
+import os
+import sys
+import glob
+import argparse
+from pathlib import Path
+
+# 재고 DB (현재고조회.xlsx / inventory.xlsx 등 재고 샤드를 가져온 SQLite 파일)
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database')
+DB_PATH = os.path.join(DATABASE_DIR, 'inventory.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    shard TEXT NOT NULL,              -- 재고 샤드 (파일명)
+    row_no INTEGER NOT NULL,          -- 시트 내 행 순서
+    product_code TEXT,
+    product_name TEXT,
+    option TEXT,
+    color TEXT,                       -- 옵션에서 분리한 컬러 (소문자)
+    color_key TEXT,                   -- 옵션 비교용 컬러 (':'/공백 제거, 소문자)
+    size TEXT,                        -- 옵션에서 분리한 사이즈 (':'/공백 제거)
+    name_colors INTEGER,              -- 같은 상품명의 컬러 수 (단일 컬러 제품 판별용)
+    price INTEGER,
+    origin TEXT,
+    available_stock INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_size_color ON inventory (shard, size, color);
+CREATE INDEX IF NOT EXISTS idx_inventory_size_color_key ON inventory (shard, size, color_key);
+CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory (shard, product_name);
+
+CREATE TABLE IF NOT EXISTS shard_files (
+    shard TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    skipped INTEGER NOT NULL DEFAULT 0  -- 가져오지 못한 시트 (수정될 때까지 다시 시도하지 않음)
+);
+"""
+
+# 재고 시트 컬럼 (헤더 이름 기준) -> DB 컬럼
+SHEET_COLUMNS = {
+    '상품코드': 'product_code',
+    '상품명': 'product_name',
+    '옵션': 'option',
+    '판매가': 'price',
+    '원산지': 'origin',
+    '가용재고': 'available_stock'
+}
+OPTIONAL_SHEET_COLUMNS = ['원산지']
+
+# SQLite 한 쿼리의 최대 파라미터 수보다 작게 나눠 조회
+QUERY_CHUNK_SIZE = 500
+
+def get_source_files(database_dir=DATABASE_DIR):
+    """가져올 재고 시트 목록 (엑셀 임시 파일 제외)"""
+    return sorted(
+        path for path in glob.glob(os.path.join(database_dir, '*.xlsx'))
+        if not os.path.basename(path).startswith('~$')
+    )
+
+def connect(db_path=None):
+    """
+    조회용 읽기 전용 연결 (스키마 생성/이전 없음 - ensure_inventory_db 이후 사용)
+    다른 스레드에서 닫을 수 있도록 check_same_thread 해제 (연결 하나를 여러 스레드가 동시에 쓰지는 않음)
+    """
+    uri = Path(os.path.abspath(db_path or DB_PATH)).as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def connect_for_build(db_path=None):
+    """DB 생성/갱신용 연결 (없으면 생성, 이전 스키마면 이전)"""
+    conn = sqlite3.connect(db_path or DB_PATH)
+    conn.row_factory = sqlite3.Row
+
+    # skipped/color_key 컬럼 이전 DB: 테이블을 지워 다음 조회에서 재생성되도록 함
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(shard_files)")]
+    if columns and 'skipped' not in columns:
+        conn.execute("DROP TABLE shard_files")
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(inventory)")]
+    if columns and 'color_key' not in columns:
+        conn.execute("DROP TABLE inventory")
+        conn.execute("DROP TABLE IF EXISTS shard_files")
+
+    conn.executescript(SCHEMA)
+    return conn
+
+def split_option(option):
+    """옵션 문자열 -> (컬러, 사이즈)  예: "크림, :120" -> ("크림", "120")"""
+    parts = str(option).split(',')
+    if len(parts) < 2:
+        return None, None
+    color = parts[0].strip().lower()
+    size = parts[1].replace(':', '').replace(' ', '').strip()
+    return color, size
+
+def option_color_key(option):
+    """옵션 비교용 컬러 (ordermain.normalize_option과 같은 규칙)  예: "라이트 그레이, :120" -> 라이트그레이"""
+    parts = str(option).replace(':', '').replace(' ', '').split(',')
+    if len(parts) < 2:
+        return None
+    return parts[0].lower().strip()
+
+def to_int_or_none(value):
+    """정수 변환 (None/NaN은 None)"""
+    if value is None or value != value:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def read_sheet(path):
+    """
+    재고 시트를 헤더 이름(상품코드, 상품명, 옵션, 판매가, 원산지, 가용재고)으로 읽기
+    필수 컬럼이 없으면 ValueError
+    """
+    import pandas as pd
+
+    df = pd.read_excel(path, engine='openpyxl')
+    missing = [column for column in SHEET_COLUMNS
+               if column not in df.columns and column not in OPTIONAL_SHEET_COLUMNS]
+    if missing:
+        raise ValueError(f"필수 컬럼 없음: {', '.join(missing)}")
+
+    for column in OPTIONAL_SHEET_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    return df[list(SHEET_COLUMNS)].rename(columns=SHEET_COLUMNS)
+
+def build_inventory_db(xlsx_paths, db_path=None):
+    """
+    재고 시트를 읽어 DB를 새로 생성 (샤드 = 파일명)
+    읽을 수 없는 시트는 건너뛰고 보고 (시트가 수정되면 다시 시도)
+    """
+    conn = connect_for_build(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM inventory")
+            conn.execute("DELETE FROM shard_files")
+
+            for path in xlsx_paths:
+                shard = os.path.splitext(os.path.basename(path))[0]
+                try:
+                    df = read_sheet(path)
+                except Exception as e:
+                    print(f"재고 파일 가져오기 실패 (건너뜀): {path} - {str(e)}")
+                    conn.execute(
+                        "INSERT INTO shard_files (shard, path, mtime, skipped) VALUES (?, ?, ?, 1)",
+                        (shard, os.path.abspath(path), os.path.getmtime(path))
+                    )
+                    continue
+
+                # 상품명별 컬러 수 (옵션의 쉼표 앞부분 기준)
+                colors_by_name = {}
+                for name, option in zip(df['product_name'], df['option']):
+                    option = str(option)
+                    color = option.split(',')[0].strip() if ',' in option else ''
+                    colors_by_name.setdefault(name, set()).add(color)
+
+                records = []
+                for row_no, row in enumerate(df.to_dict('records')):
+                    color, size = split_option(row['option'])
+                    records.append((
+                        shard, row_no, str(row['product_code']), row['product_name'],
+                        str(row['option']), color, option_color_key(row['option']), size,
+                        len(colors_by_name.get(row['product_name'], ())),
+                        to_int_or_none(row['price']), row['origin'],
+                        to_int_or_none(row['available_stock'])
+                    ))
+
+                conn.executemany(
+                    "INSERT INTO inventory (shard, row_no, product_code, product_name, option, "
+                    "color, color_key, size, name_colors, price, origin, available_stock) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    records
+                )
+                conn.execute(
+                    "INSERT INTO shard_files (shard, path, mtime) VALUES (?, ?, ?)",
+                    (shard, os.path.abspath(path), os.path.getmtime(path))
+                )
+                print(f"가져옴: {path} ({len(records)}행)")
+    finally:
+        conn.close()
+
+def is_stale(xlsx_paths, db_path=None):
+    """DB가 없거나 재고 시트 목록/수정 시각이 달라졌으면 True"""
+    db_path = db_path or DB_PATH
+    if not os.path.exists(db_path):
+        return True
+
+    conn = connect_for_build(db_path)
+    try:
+        recorded = {row['path']: row['mtime'] for row in conn.execute("SELECT path, mtime FROM shard_files")}
+    finally:
+        conn.close()
+
+    current = {os.path.abspath(path): os.path.getmtime(path) for path in xlsx_paths}
+    if set(current) != set(recorded):
+        return True
+    return any(current[path] > recorded[path] for path in current)
+
+def ensure_inventory_db(xlsx_paths, db_path=None):
+    """필요할 때만 DB 재생성 (시트가 그대로면 xlsx 파싱 생략)"""
+    if xlsx_paths and is_stale(xlsx_paths, db_path):
+        build_inventory_db(xlsx_paths, db_path)
+
+def list_shards(conn):
+    """DB에 들어있는 샤드 목록 (가져온 순서, 건너뛴 시트 제외)"""
+    return [row['shard'] for row in conn.execute(
+        "SELECT shard FROM shard_files WHERE skipped = 0 ORDER BY rowid")]
+
+def list_product_names(conn, shard):
+    """샤드의 상품명 목록 (중복 제거, 시트에 처음 나온 순서) - 퍼지 비교는 상품명 단위로만 수행"""
+    return [row['product_name'] for row in conn.execute(
+        "SELECT product_name FROM inventory WHERE shard = ? AND product_name IS NOT NULL "
+        "GROUP BY product_name ORDER BY MIN(row_no)",
+        (shard,))]
+
+def query_by_names(conn, shard, names):
+    """샤드에서 주어진 상품명의 행만 조회 (상품명 인덱스 사용, 시트 순서 유지)"""
+    names = list(names)
+    rows = []
+    for start in range(0, len(names), QUERY_CHUNK_SIZE):
+        chunk = names[start:start + QUERY_CHUNK_SIZE]
+        rows.extend(conn.execute(
+            "SELECT * FROM inventory WHERE shard = ? AND product_name IN ("
+            + ", ".join("?" * len(chunk)) + ")",
+            [shard] + chunk
+        ))
+    rows.sort(key=lambda row: row['row_no'])
+    return rows
+
+def query_options(conn, shard, size, color_key):
+    """
+    샤드에서 주문 옵션과 맞는 행만 조회 (인덱스 사용, 시트 순서 유지)
+    사이즈가 같고 컬러가 같거나 단일 컬러 제품인 행 (ordermain 옵션 매칭 조건과 동일)
+    """
+    return conn.execute(
+        "SELECT * FROM inventory WHERE shard = ? AND size = ? AND (color_key = ? OR name_colors = 1) "
+        "ORDER BY row_no",
+        (shard, str(size), str(color_key))
+    ).fetchall()
+
+def query_candidates(conn, shard, size=None, color=None):
+    """
+    샤드에서 사이즈/컬러 조건에 맞는 행만 조회 (인덱스 사용, 시트 순서 유지)
+    조건을 생략하면 해당 조건은 필터링하지 않음
+    """
+    conditions = ["shard = ?"]
+    params = [shard]
+    if size is not None:
+        conditions.append("size = ?")
+        params.append(str(size))
+    if color is not None:
+        conditions.append("color = ?")
+        params.append(str(color).strip().lower())
+
+    return conn.execute(
+        "SELECT * FROM inventory WHERE " + " AND ".join(conditions) + " ORDER BY row_no",
+        params
+    ).fetchall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OZKIZ 재고 DB 생성")
+    parser.add_argument('command', choices=['build', 'status'])
+    parser.add_argument('--db', default=DB_PATH, help="재고 DB 파일")
+    parser.add_argument('files', nargs='*', help="재고 시트 (생략시 database 폴더의 모든 xlsx)")
+    args = parser.parse_args()
+
+    xlsx_paths = args.files or get_source_files()
+    if not xlsx_paths:
+        print("database 폴더에 재고 파일이 없습니다.")
+        sys.exit(1)
+
+    if args.command == 'build':
+        build_inventory_db(xlsx_paths, args.db)
+        print(f"재고 DB 생성 완료: {args.db}")
+    elif args.command == 'status':
+        print("재생성 필요" if is_stale(xlsx_paths, args.db) else "최신 상태")
@@ -0,0 +1,342 @@
+import sqlite3
+import os
+import sys
+import glob
+import re
+import uuid
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+# 발주 이력 원장 (실행마다 추가만 하는 SQLite 파일)
+LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', 'order_ledger.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_runs (
+    run_id TEXT PRIMARY KEY,
+    order_key TEXT NOT NULL,          -- 같은 주문 식별자 (입력 범위 + 입력 내용 해시): 같은 입력을 다시 처리하면 최신 실행만 집계
+    source_file TEXT NOT NULL,        -- 발주서/결과 파일명 (실행마다 고유)
+    started_at TEXT NOT NULL          -- 'YYYY-MM-DD HH:MM:SS'
+);
+CREATE INDEX IF NOT EXISTS idx_runs_order_key ON ledger_runs (order_key);
+CREATE INDEX IF NOT EXISTS idx_runs_source_file ON ledger_runs (source_file);
+
+CREATE TABLE IF NOT EXISTS order_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,                      -- ledger_runs.run_id
+    ordered_at TEXT NOT NULL,         -- 'YYYY-MM-DD HH:MM:SS'
+    source_file TEXT NOT NULL,        -- 발주서/결과 파일명
+    product_code TEXT NOT NULL,
+    product_name TEXT,
+    color TEXT,
+    size TEXT,
+    quantity INTEGER NOT NULL,        -- 정정 기록은 음수
+    price INTEGER,
+    inventory_source TEXT             -- 재고 샤드
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_code_date ON order_ledger (product_code, ordered_at);
+CREATE INDEX IF NOT EXISTS idx_ledger_date ON order_ledger (ordered_at);
+CREATE INDEX IF NOT EXISTS idx_ledger_source_file ON order_ledger (source_file);
+CREATE INDEX IF NOT EXISTS idx_ledger_run ON order_ledger (run_id);
+
+-- 주문별 최신 실행 (내용이 같은 입력을 다시 처리하면 이전 실행은 집계에서 제외)
+CREATE VIEW IF NOT EXISTS latest_runs AS
+SELECT run_id, MAX(started_at || '#' || printf('%012d', rowid)) AS run_order
+FROM ledger_runs GROUP BY order_key;
+
+-- 추가 전용: 수정/삭제 금지 (정정은 음수 수량으로 기록)
+CREATE TRIGGER IF NOT EXISTS ledger_no_update BEFORE UPDATE ON order_ledger
+BEGIN
+    SELECT RAISE(ABORT, 'order_ledger is append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS ledger_no_delete BEFORE DELETE ON order_ledger
+BEGIN
+    SELECT RAISE(ABORT, 'order_ledger is append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS ledger_runs_no_update BEFORE UPDATE ON ledger_runs
+BEGIN
+    SELECT RAISE(ABORT, 'ledger_runs is append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS ledger_runs_no_delete BEFORE DELETE ON ledger_runs
+BEGIN
+    SELECT RAISE(ABORT, 'ledger_runs is append-only');
+END;
+"""
+
+def connect(db_path=None):
+    """원장 DB 연결 (없으면 생성)"""
+    db_path = db_path or LEDGER_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+
+    # run_id 이전 원장: 컬럼만 추가 (실행 정보가 없는 기존 행은 집계에서 제외)
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(order_ledger)")]
+    if columns and 'run_id' not in columns:
+        conn.execute("ALTER TABLE order_ledger ADD COLUMN run_id TEXT")
+
+    conn.executescript(SCHEMA)
+    return conn
+
+def to_int_or_none(value):
+    """정수 변환 (None/NaN은 None)"""
+    if value is None or value != value:
+        return None
+    return int(value)
+
+def start_run(order_key, source_file, started_at=None, db_path=None):
+    """
+    실행 하나를 원장에 등록 -> run_id
+
+    Args:
+        order_key (str): 같은 주문을 식별하는 키 (input_order_key). 같은 키로 다시 실행하면
+                         집계에는 최신 실행만 반영됨
+        source_file (str): 발주서/결과 파일명 (실행마다 고유)
+        started_at (datetime): 실행 시각 (기본: 현재)
+    """
+    started_at = started_at or datetime.now()
+    run_id = f"{started_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO ledger_runs (run_id, order_key, source_file, started_at) VALUES (?, ?, ?, ?)",
+                (run_id, order_key, os.path.basename(source_file),
+                 started_at.strftime('%Y-%m-%d %H:%M:%S'))
+            )
+    finally:
+        conn.close()
+    return run_id
+
+def record_orders(rows, run_id, ordered_at=None, db_path=None):
+    """
+    발주 결과를 원장에 추가 (정정 기록도 같은 run_id로 추가)
+
+    Args:
+        rows (iterable): product_code, quantity 필수 / product_name, color, size,
+                         price, inventory_source 선택 키를 가진 dict
+        run_id (str): start_run으로 등록한 실행
+        ordered_at (datetime): 발주 시각 (기본: 현재)
+
+    Returns:
+        int: 추가된 행 수
+    """
+    ordered_at = (ordered_at or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+
+    conn = connect(db_path)
+    try:
+        run = conn.execute("SELECT source_file FROM ledger_runs WHERE run_id = ?", (run_id,)).fetchone()
+        if run is None:
+            raise ValueError(f"등록되지 않은 실행입니다: {run_id}")
+
+        records = [
+            (
+                run_id,
+                ordered_at,
+                run['source_file'],
+                str(row['product_code']),
+                row.get('product_name'),
+                None if row.get('color') is None else str(row.get('color')),
+                None if row.get('size') is None else str(row.get('size')),
+                int(row['quantity']),
+                to_int_or_none(row.get('price')),
+                row.get('inventory_source')
+            )
+            for row in rows
+        ]
+
+        with conn:
+            conn.executemany(
+                "INSERT INTO order_ledger (run_id, ordered_at, source_file, product_code, product_name, "
+                "color, size, quantity, price, inventory_source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records
+            )
+    finally:
+        conn.close()
+    return len(records)
+
+def period_bounds(start=None, end=None):
+    """'YYYY-MM-DD' 기간 -> SQL 조건 (종료일 포함)"""
+    conditions = []
+    params = []
+    if start:
+        conditions.append("l.ordered_at >= ?")
+        params.append(start)
+    if end:
+        next_day = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)
+        conditions.append("l.ordered_at < ?")
+        params.append(next_day.strftime('%Y-%m-%d'))
+    return conditions, params
+
+def query_sku(product_code, start=None, end=None, db_path=None):
+    """
+    SKU 하나의 기간 합계 (주문별 최신 실행만 집계)
+    -> dict(product_code, quantity, lines, runs, first_at, last_at)
+    """
+    conditions, params = period_bounds(start, end)
+    conditions.insert(0, "l.product_code = ?")
+    params.insert(0, str(product_code))
+
+    conn = connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT COALESCE(SUM(l.quantity), 0) AS quantity, COUNT(*) AS lines, "
+            "COUNT(DISTINCT l.run_id) AS runs, MIN(l.ordered_at) AS first_at, "
+            "MAX(l.ordered_at) AS last_at "
+            "FROM order_ledger l JOIN latest_runs r ON l.run_id = r.run_id "
+            "WHERE " + " AND ".join(conditions),
+            params
+        ).fetchone()
+    finally:
+        conn.close()
+    return {'product_code': str(product_code), **dict(row)}
+
+def query_period(start=None, end=None, db_path=None):
+    """기간 내 SKU별 합계 목록 (주문별 최신 실행만 집계, 수량 내림차순)"""
+    conditions, params = period_bounds(start, end)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT l.product_code, MAX(l.product_name) AS product_name, SUM(l.quantity) AS quantity, "
+            "COUNT(*) AS lines, COUNT(DISTINCT l.run_id) AS runs "
+            "FROM order_ledger l JOIN latest_runs r ON l.run_id = r.run_id "
+            f"{where} GROUP BY l.product_code ORDER BY quantity DESC",
+            params
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def input_order_key(scope, chunks):
+    """
+    주문 식별자 = 입력 범위 + 입력 내용 해시
+    같은 범위(입력 파일/GUI 세션)에서 내용까지 같은 입력만 같은 주문으로 보고,
+    파일명이 같아도 내용이 다르면 별도 주문으로 기록
+
+    Args:
+        scope (str): 입력 범위 (예: 'results:<name>', 'gui:<세션>')
+        chunks (iterable): 입력 내용 (bytes 조각 또는 텍스트 라인)
+    """
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        digest.update(chunk if isinstance(chunk, bytes) else f"{chunk}\n".encode('utf-8'))
+    return f"{scope}#{digest.hexdigest()}"
+
+def import_output_files(output_dir, db_path=None):
+    """
+    기존 output 폴더의 발주서/결과 파일을 원장에 가져오기
+    - 어드민_발주서_<timestamp>.xlsx: 파일명의 시각 사용, 이미 기록된 파일은 건너뜀
+    - <name>_results.xlsx: 파일 수정 시각 사용, 파일마다 별도 주문으로 기록
+      (ordermain이 이 파일을 저장한 뒤 실시간으로 기록했으면 건너뜀)
+    """
+    import pandas as pd
+
+    conn = connect(db_path)
+    try:
+        recorded = {row[0] for row in conn.execute("SELECT DISTINCT source_file FROM ledger_runs")}
+        # 결과 파일별 마지막 실시간 기록 시각 (source_file = '<파일명>@<시각>')
+        latest_by_file = {}
+        for row in conn.execute("SELECT source_file, started_at FROM ledger_runs WHERE source_file LIKE '%@%'"):
+            filename = row[0].rsplit('@', 1)[0]
+            latest_by_file[filename] = max(latest_by_file.get(filename, ''), row[1])
+    finally:
+        conn.close()
+
+    imported = 0
+    for path in sorted(glob.glob(os.path.join(output_dir, '*.xlsx'))):
+        filename = os.path.basename(path)
+        if filename.startswith('~$'):
+            continue
+
+        admin_match = re.match(r'어드민_발주서_(\d{8}_\d{6})\.xlsx$', filename)
+        if admin_match:
+            if filename in recorded:
+                continue
+            ordered_at = datetime.strptime(admin_match.group(1), '%Y%m%d_%H%M%S')
+            order_key = f"import:{filename}"
+            source_file = filename
+            df = pd.read_excel(path)
+            rows = [
+                {
+                    'product_code': row['product_code'],
+                    'product_name': row['product_name'],
+                    'color': row['color'],
+                    'size': row['size'],
+                    'quantity': row['quantity'],
+                    'inventory_source': row.get('source')
+                }
+                for row in df.to_dict('records')
+            ]
+        elif filename.endswith('_results.xlsx'):
+            ordered_at = datetime.fromtimestamp(int(os.path.getmtime(path)))
+            source_file = f"{filename}@{ordered_at.strftime('%Y%m%d_%H%M%S')}"
+            order_key = f"import:{source_file}"
+            latest = latest_by_file.get(filename)
+            if source_file in recorded or (latest and latest >= ordered_at.strftime('%Y-%m-%d %H:%M:%S')):
+                continue
+            df = pd.read_excel(path)
+            df = df[df['Matched_Code'] != '매칭 실패']
+            rows = [
+                {
+                    'product_code': row['Matched_Code'],
+                    'product_name': row['Matched_Name'],
+                    'color': row['Order_Color'],
+                    'size': row['Order_Size'],
+                    'quantity': row['Order_Quantity'],
+                    'price': row['Matched_Price'],
+                    'inventory_source': row.get('Matched_Source')
+                }
+                for row in df.to_dict('records')
+            ]
+        else:
+            continue
+
+        run_id = start_run(order_key, source_file, ordered_at, db_path)
+        count = record_orders(rows, run_id, ordered_at, db_path)
+        print(f"가져옴: {filename} ({count}건)")
+        imported += count
+
+    return imported
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OZKIZ 발주 이력 원장 조회")
+    parser.add_argument('--db', default=LEDGER_PATH, help="원장 DB 파일")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sku_parser = subparsers.add_parser('sku', help="SKU별 발주 합계")
+    sku_parser.add_argument('product_code')
+    sku_parser.add_argument('--from', dest='start', help="시작일 (YYYY-MM-DD)")
+    sku_parser.add_argument('--to', dest='end', help="종료일 (YYYY-MM-DD, 포함)")
+
+    period_parser = subparsers.add_parser('period', help="기간 내 SKU별 발주 합계")
+    period_parser.add_argument('--from', dest='start', help="시작일 (YYYY-MM-DD)")
+    period_parser.add_argument('--to', dest='end', help="종료일 (YYYY-MM-DD, 포함)")
+    period_parser.add_argument('--limit', type=int, default=50, help="출력할 SKU 수")
+
+    import_parser = subparsers.add_parser('import', help="기존 output 폴더 파일 가져오기")
+    import_parser.add_argument('output_dir', nargs='?', default=os.path.dirname(LEDGER_PATH))
+
+    args = parser.parse_args()
+
+    if args.command == 'sku':
+        result = query_sku(args.product_code, args.start, args.end, args.db)
+        print(f"상품코드: {result['product_code']}")
+        print(f"발주수량: {result['quantity']}개")
+        print(f"발주건수: {result['lines']}건 (발주서 {result['runs']}개)")
+        if result['first_at']:
+            print(f"기간: {result['first_at']} ~ {result['last_at']}")
+    elif args.command == 'period':
+        rows = query_period(args.start, args.end, args.db)
+        print(f"SKU {len(rows)}개")
+        for row in rows[:args.limit]:
+            print(f"{row['product_code']}\t{row['product_name']}\t{row['quantity']}개\t"
+                  f"({row['lines']}건, 발주서 {row['runs']}개)")
+    elif args.command == 'import':
+        if not os.path.isdir(args.output_dir):
+            print(f"폴더를 찾을 수 없습니다: {args.output_dir}")
+            sys.exit(1)
+        count = import_output_files(args.output_dir, args.db)
+        print(f"총 {count}건 가져옴")
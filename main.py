@@ -5,6 +5,14 @@ from tkinter import ttk, scrolledtext, filedialog, messagebox
 import re
 from datetime import datetime
 import os
+import glob
+import hashlib
+import time
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import ledger
+import inventory_db
 
 class OZKIZOrderSystem:
     def __init__(self):
@@ -38,6 +46,45 @@ class OZKIZOrderSystem:
             'orange': '오렌지'
         }
         
+        # 주문 라인별 대안 후보 수
+        self.top_n_alternatives = 3
+        
+        # 대안 검토 대상 라인: 매칭 실패 또는 이 점수 미만으로 매칭된 라인
+        self.review_score_threshold = 80
+        
+        # 마지막 처리 결과 (대안 선택용)
+        self.last_entries = []
+        self.picker_entries = []
+        self.last_output_path = None
+        
+        # 대용량 주문 파일 직접 처리 모드
+        # 기준 크기를 넘는 파일은 입력창에 미리보기만 표시하고 처리시 파일에서 바로 읽음
+        self.large_file_threshold = 1024 * 1024  # 1MB
+        self.preview_lines = 200
+        self.direct_file_path = None
+        
+        # 결과창에 표시할 최대 결과 수 (나머지는 발주서 파일 참조)
+        self.result_display_limit = 1000
+        # 라인 선택 콤보박스에 넣을 최대 검토 대상 라인 수 (Tk 위젯 부담 제한)
+        self.picker_display_limit = 200
+        
+        # 빠른 처리 모드 (라인당 시간 예산, ms)
+        # 정확 일치 -> 컬러/사이즈 인덱스 후보 순으로 찾고, 못 찾은 라인만 남은 시간 동안 전체 스캔으로 대안 후보 수집
+        self.line_budget_ms = 200
+        
+        # 발주 이력 원장: 같은 세션(파일/입력)에서 같은 내용을 다시 처리하면 최신 실행만 집계
+        # (내용이 바뀌면 별도 주문으로 기록)
+        self.ledger_session_key = self.new_ledger_session_key()
+        self.ledger_run_id = None
+        
+        # 라인별 처리 결과 캐시 {(라인 해시, 적용 제품군): (파싱 결과, 매칭 결과)}
+        # 재처리시 추가/수정된 라인만 다시 매칭
+        self.line_cache = {}
+        
+        # 재고 DB 조회 연결 (스레드별 읽기 전용 연결 하나를 재사용)
+        self.db_local = threading.local()
+        self.db_connections = []
+        
         # GUI 초기화
         self.window = tk.Tk()
         self.window.title("OZKIZ 발주 시스템")
@@ -46,45 +93,109 @@ class OZKIZOrderSystem:
         # 데이터베이스 로드
         self.load_database()
         
+        # 샤드 조회용 작업 풀 (조회마다 새로 만들지 않고 재사용)
+        # 조회 단위가 주문 한 건이라 샤드 데이터를 프로세스로 넘기는 비용이 더 커서 스레드 사용
+        self.shard_executor = ThreadPoolExecutor(max_workers=max(1, len(self.inventory_shards)))
+        
         # GUI 구성
         self.create_gui()
 
     def load_database(self):
+        """database 폴더의 재고 시트(창고/브랜드별 샤드)를 각각 로드"""
+        self.inventory_shards = []
+        
+        # 샤드 파일 목록 (엑셀 임시 파일 제외)
+        shard_paths = sorted(
+            path for path in glob.glob(os.path.join(self.database_dir, '*.xlsx'))
+            if not os.path.basename(path).startswith('~$')
+        )
+        print(f"Loading {len(shard_paths)} inventory shards from: {self.database_dir}")  # 디버깅용
+        
+        # 재고 DB(database/inventory.db)가 있으면 DB 백엔드 사용 (xlsx 파싱 생략)
+        self.inventory_db_path = os.path.join(self.database_dir, 'inventory.db')
+        if os.path.exists(self.inventory_db_path):
+            try:
+                self.load_inventory_db(shard_paths)
+                return
+            except Exception as e:
+                print(f"Error loading inventory db: {str(e)}")  # 디버깅용
+                self.inventory_shards = []
+        
+        if shard_paths:
+            with ThreadPoolExecutor(max_workers=len(shard_paths)) as executor:
+                for shard in executor.map(self.load_inventory_shard, shard_paths):
+                    if shard is not None:
+                        self.inventory_shards.append(shard)
+        
+        if not self.inventory_shards:
+            print("Database file not found, creating empty DataFrame")
+        
+        # 전체 재고 (샤드 합본, 조회용)
+        self.inventory_df = pd.concat(
+            [shard['df'] for shard in self.inventory_shards] or [self.empty_inventory_df()],
+            ignore_index=True
+        )
+        print("Database loaded successfully")  # 디버깅용
+
+    def load_inventory_db(self, shard_paths):
+        """재고 DB 샤드 목록 로드 (재고 시트가 바뀐 경우에만 DB 재생성)"""
+        inventory_db.ensure_inventory_db(shard_paths, self.inventory_db_path)
+        
+        conn = self.inventory_conn()
+        
+        # DB 샤드는 DataFrame 없이 조회시 인덱스 검색
+        self.inventory_shards = [
+            {'source': source, 'df': None,
+             'names': inventory_db.list_product_names(conn, source)}
+            for source in inventory_db.list_shards(conn)
+        ]
+        
+        self.inventory_df = self.empty_inventory_df()
+        print(f"Inventory db loaded: {len(self.inventory_shards)} shards")  # 디버깅용
+
+    def inventory_conn(self):
+        """현재 스레드의 재고 DB 연결 (처음 조회할 때 한 번만 연결)"""
+        conn = getattr(self.db_local, 'conn', None)
+        if conn is None:
+            conn = inventory_db.connect(self.inventory_db_path)
+            self.db_local.conn = conn
+            self.db_connections.append(conn)
+        return conn
+
+    def empty_inventory_df(self):
+        """빈 재고 DataFrame 생성"""
+        return pd.DataFrame(columns=[
+            'product_code', 'product_name', 'option',
+            'price', 'origin', 'available_stock', 'source'
+        ])
+
+    def load_inventory_shard(self, db_path):
+        """재고 샤드 하나 로드 (실패시 None)"""
         try:
-            # 데이터베이스 파일 경로
-            db_path = os.path.join(self.base_dir, 'database', 'inventory.xlsx')
             print(f"Loading database from: {db_path}")  # 디버깅용
             
-            # 파일이 없으면 빈 DataFrame 생성
-            if not os.path.exists(db_path):
-                print("Database file not found, creating empty DataFrame")
-                self.inventory_df = pd.DataFrame(columns=[
-                    'product_code', 'product_name', 'option',
-                    'price', 'origin', 'available_stock'
-                ])
-                return
+            # Excel 파일 읽기 (헤더 이름으로 컬럼 선택 - 재고 DB와 같은 규칙, 필수 컬럼이 없으면 건너뜀)
+            df = inventory_db.read_sheet(db_path)
+            print(f"Loaded {len(df)} rows")  # 디버깅용
             
-            # Excel 파일 읽기
-            self.inventory_df = pd.read_excel(db_path, engine='openpyxl')
-            print(f"Loaded {len(self.inventory_df)} rows")  # 디버깅용
+            # 샤드 출처 (파일명)
+            source = os.path.splitext(os.path.basename(db_path))[0]
+            df['source'] = source
             
-            # 컬럼명 설정
-            self.inventory_df.columns = [
-                'product_code',      # 상품코드
-                'product_name',      # 상품명
-                'option',            # 옵션
-                'price',             # 판매가
-                'origin',            # 원산지
-                'available_stock'    # 가용재고
-            ]
-            print("Database loaded successfully")  # 디버깅용
+            # 컬러/사이즈 인덱스 {(컬러, 사이즈): [행 위치]} (빠른 처리 모드용)
+            option_index = {}
+            for pos, option in enumerate(df['option']):
+                option_parts = str(option).strip().split(',')
+                if len(option_parts) >= 2:
+                    key = (option_parts[0].strip().lower(),
+                           option_parts[1].strip().replace(':', '').strip())
+                    option_index.setdefault(key, []).append(pos)
+            
+            return {'source': source, 'df': df, 'option_index': option_index}
             
         except Exception as e:
-            print(f"Error loading database: {str(e)}")  # 디버깅용
-            self.inventory_df = pd.DataFrame(columns=[
-                'product_code', 'product_name', 'option',
-                'price', 'origin', 'available_stock'
-            ])
+            print(f"Error loading database {db_path}: {str(e)}")  # 디버깅용
+            return None
 
     def create_gui(self):
         # 메뉴바 생성
@@ -117,6 +228,28 @@ class OZKIZOrderSystem:
         ttk.Button(button_frame, text="초기화", 
                   command=self.clear_all).pack(side=tk.LEFT, padx=5)
         
+        # 빠른 처리 모드 (라인당 시간 예산)
+        self.anytime_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="빠른 처리 (라인당 시간 예산)", 
+                       variable=self.anytime_var).pack(side=tk.LEFT, padx=5)
+        self.budget_var = tk.StringVar(value=str(self.line_budget_ms))
+        ttk.Entry(button_frame, textvariable=self.budget_var, width=6).pack(side=tk.LEFT)
+        ttk.Label(button_frame, text="ms").pack(side=tk.LEFT)
+        
+        # 대안 선택 프레임 (매칭 실패/약한 매칭 라인을 재실행 없이 수정)
+        alt_frame = ttk.LabelFrame(self.window, text="대안 선택", padding="5")
+        alt_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.line_picker = ttk.Combobox(alt_frame, state='readonly', width=60)
+        self.line_picker.pack(side=tk.LEFT, padx=5)
+        self.line_picker.bind('<<ComboboxSelected>>', self.on_line_selected)
+        
+        self.alt_picker = ttk.Combobox(alt_frame, state='readonly', width=80)
+        self.alt_picker.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(alt_frame, text="대안 적용", 
+                  command=self.apply_alternative).pack(side=tk.LEFT, padx=5)
+        
         # 결과 표시 프레임
         result_frame = ttk.LabelFrame(self.window, text="처리 결과", padding="10")
         result_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -139,13 +272,52 @@ class OZKIZOrderSystem:
         )
         if file_path:
             try:
+                self.direct_file_path = None
+                self.ledger_session_key = f"file:{os.path.abspath(file_path)}"
+                self.order_text.config(state=tk.NORMAL)
+                self.order_text.delete(1.0, tk.END)
+                
+                if os.path.getsize(file_path) > self.large_file_threshold:
+                    self.load_large_order_file(file_path)
+                    return
+                
                 with open(file_path, 'r', encoding='utf-8') as file:
-                    self.order_text.delete(1.0, tk.END)
                     self.order_text.insert(tk.END, file.read())
                 self.status_var.set(f"파일 로드됨: {os.path.basename(file_path)}")
             except Exception as e:
                 messagebox.showerror("오류", f"파일 로드 실패: {str(e)}")
 
+    def load_large_order_file(self, file_path):
+        """대용량 주문 파일: 미리보기와 줄 수만 표시하고 처리시 파일에서 직접 읽음"""
+        preview = []
+        line_count = 0
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line_count < self.preview_lines:
+                    preview.append(line)
+                line_count += 1
+        
+        self.order_text.insert(tk.END,
+            f"[대용량 파일 직접 처리 모드] {os.path.basename(file_path)} "
+            f"({line_count:,}줄, 처음 {len(preview)}줄 미리보기)\n"
+            f"----------------------------------------\n"
+        )
+        self.order_text.insert(tk.END, ''.join(preview))
+        
+        # 미리보기는 편집 불가 (처리는 파일 원본 기준)
+        self.order_text.config(state=tk.DISABLED)
+        self.direct_file_path = file_path
+        self.status_var.set(f"파일 로드됨 (직접 처리 모드): {os.path.basename(file_path)}, {line_count:,}줄")
+
+    def iter_order_lines(self):
+        """처리할 주문 라인 (직접 처리 모드면 파일에서 한 줄씩 읽음)"""
+        if self.direct_file_path:
+            with open(self.direct_file_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    yield line.rstrip('\r\n')
+        else:
+            yield from self.order_text.get(1.0, tk.END).strip().split('\n')
+
     def parse_order(self, order_text):
         """주문 텍스트 파싱"""
         print(f"\n주문 파싱: {order_text}")  # 디버깅용
@@ -197,27 +369,168 @@ class OZKIZOrderSystem:
         color_lower = str(color).lower().strip()
         return self.color_mapping.get(color_lower, color)
 
-    def find_matching_product(self, search_info):
-        """재고 DB에서 일치하는 제품 찾기"""
+    def find_matching_product(self, search_info, deadline=None):
+        """
+        재고 DB에서 일치하는 제품 찾기 (샤드별 병렬 조회 후 최고 점수 선택)
+        
+        deadline이 있으면 (빠른 처리 모드, time.monotonic 기준) 싼 방법부터 시도:
+        1) 정확 일치  2) 컬러/사이즈 인덱스 후보 퍼지 비교 - 찾으면 바로 반환 (대안 후보 없음)
+        3) 둘 다 못 찾은 경우에만 남은 시간 동안 전체 스캔 - 매칭 조건(컬러/사이즈 일치)은
+           인덱스 단계와 같으므로 매칭은 찾을 수 없고 대안 후보 수집용
+        
+        Returns:
+            tuple: (매칭 행 또는 None, 대안 후보 목록,
+                    처리 정보 {'stage': 'exact'/'index'/'full',
+                              'budget_limited': 인덱스 단계가 시간 예산으로 끝까지 못 간 경우
+                                                (빠른 처리 해제 후 다시 처리하면 결과가 달라질 수 있음)})
+        """
         print(f"검색 정보: {search_info}")  # 디버깅용
         best_match = None
         best_score = 0
+        candidates = []
+        match_info = {'stage': 'full', 'budget_limited': False}
         
         # 컬러 한글 변환
         search_color = self.translate_color(search_info['color'])
         print(f"검색 컬러 변환: {search_info['color']} -> {search_color}")  # 디버깅용
         
-        for _, row in self.inventory_df.iterrows():
-            # 제품명 정규화
-            product_name_clean = str(search_info['product_name']).strip().lower().replace(" ", "")
+        if self.inventory_shards and deadline is not None:
+            index_matches = list(self.shard_executor.map(
+                lambda shard: self.match_in_index(search_info, search_color, shard, deadline),
+                self.inventory_shards
+            ))
+            
+            # 샤드 간 최고 점수 선택 (동점이면 앞쪽 샤드 우선)
+            for match, score, stage, timed_out in index_matches:
+                if match is not None and score > best_score:
+                    best_match, best_score = match, score
+                    match_info['stage'] = stage
+                if timed_out:
+                    match_info['budget_limited'] = True
+            
+            # 정확 일치/인덱스에서 찾았으면 전체 스캔 없이 바로 반환
+            if best_match is not None:
+                print(f"최종 매칭: {best_match['product_name']} ({best_match['source']}, {match_info['stage']})")  # 디버깅용
+                match_info['score'] = best_score
+                return best_match, [], match_info
+        
+        # 전체 스캔 (빠른 처리 모드에서는 싼 방법으로 못 찾았고 남은 시간이 있을 때만 대안 후보 수집)
+        # 대안 후보 수집이 시간 예산으로 중단돼도 매칭 결과는 같으므로 budget_limited는 바꾸지 않음
+        if self.inventory_shards and (deadline is None or time.monotonic() < deadline):
+            shard_matches = list(self.shard_executor.map(
+                lambda shard: self.match_in_shard(search_info, search_color, shard, deadline),
+                self.inventory_shards
+            ))
+            
+            # 샤드 간 최고 점수 선택 (동점이면 앞쪽 샤드 우선)
+            for shard_idx, (match, score, shard_candidates, timed_out) in enumerate(shard_matches):
+                if match is not None and score > best_score:
+                    best_match, best_score = match, score
+                    match_info['stage'] = 'full'
+                candidates.extend(
+                    (cand_score, -shard_idx, neg_seq, cand)
+                    for cand_score, neg_seq, cand in shard_candidates
+                )
+        
+        # 샤드별 상품 후보 병합 (선택된 매칭과 같은 상품은 제외)
+        candidates.sort(key=lambda item: item[:3], reverse=True)
+        alternatives = []
+        for _, _, _, cand in candidates:
+            if len(alternatives) >= self.top_n_alternatives:
+                break
+            if (best_match is not None and cand['source'] == best_match['source']
+                    and str(cand['product_name']).strip() == str(best_match['product_name']).strip()):
+                continue
+            alternatives.append(cand)
+        
+        if best_match is None:
+            print(f"매칭 실패: {search_info}")  # 디버깅용
+        else:
+            print(f"최종 매칭: {best_match['product_name']} ({best_match['source']}, {match_info['stage']})")  # 디버깅용
+        
+        match_info['score'] = best_score
+        return best_match, alternatives, match_info
+
+    def match_in_index(self, search_info, search_color, shard, deadline):
+        """
+        샤드 하나에서 컬러/사이즈 인덱스 후보만 비교 -> (매칭 행, 점수, 단계, 시간 초과 여부)
+        제품명이 정확히 같은 후보가 있으면 퍼지 비교 없이 바로 반환
+        """
+        color_key = str(search_color).strip().lower()
+        size_key = str(search_info['size']).strip()
+        product_name_clean = str(search_info['product_name']).strip().lower().replace(" ", "")
+        
+        if shard['df'] is not None:
+            rows = [shard['df'].iloc[pos] for pos in shard['option_index'].get((color_key, size_key), [])]
+        else:
+            rows = [
+                {**dict(row), 'source': shard['source']}
+                for row in inventory_db.query_candidates(
+                    self.inventory_conn(), shard['source'], size=size_key, color=color_key)
+            ]
+        
+        # 1) 정확 일치
+        for row in rows:
+            if str(row['product_name']).strip().lower().replace(" ", "") == product_name_clean:
+                return row, 100, 'exact', False
+        
+        # 2) 인덱스 후보 퍼지 비교
+        best_match = None
+        best_score = 0
+        for row in rows:
+            if time.monotonic() > deadline:
+                return best_match, best_score, 'index', True
+            
+            inventory_name_clean = str(row['product_name']).strip().lower().replace(" ", "")
+            name_score = fuzz.ratio(product_name_clean, inventory_name_clean)
+            if name_score > 60 and name_score > best_score:
+                best_score = name_score
+                best_match = row
+        
+        return best_match, best_score, 'index', False
+
+    def match_in_shard(self, search_info, search_color, shard, deadline=None):
+        """
+        샤드 하나에서 최적 매칭 검색 -> (매칭 행, 점수, 상품별 후보, 시간 초과 여부)
+        상품별 후보: 옵션과 무관하게 제품명 점수 상위 N개 상품 (같은 스캔에서 수집,
+                     같은 상품의 다른 옵션은 주문 옵션에 가장 가까운 행 하나로 묶음)
+        deadline을 넘기면 그때까지의 결과로 중단
+        """
+        if shard['df'] is None:
+            return self.match_in_db_shard(search_info, search_color, shard, deadline)
+        
+        best_match = None
+        best_score = 0
+        products = {}  # 상품명별 대표 후보
+        timed_out = False
+        
+        # 선택된 매칭과 같은 상품이 후보에서 빠질 수 있으므로 1개 더 수집
+        top_n = self.top_n_alternatives + 1
+        
+        # 제품명 정규화
+        product_name_clean = str(search_info['product_name']).strip().lower().replace(" ", "")
+        name_scores = {}  # 상품명별 점수 (같은 상품명은 한 번만 계산)
+        
+        for seq, (_, row) in enumerate(shard['df'].iterrows()):
+            if deadline is not None and time.monotonic() > deadline:
+                timed_out = True
+                break
+            
             inventory_name_clean = str(row['product_name']).strip().lower().replace(" ", "")
             
             # 퍼지 매칭 점수 계산
-            name_score = fuzz.ratio(product_name_clean, inventory_name_clean)
+            if inventory_name_clean not in name_scores:
+                name_scores[inventory_name_clean] = fuzz.ratio(product_name_clean, inventory_name_clean)
+            name_score = name_scores[inventory_name_clean]
             
-            print(f"비교: '{product_name_clean}' vs '{inventory_name_clean}' = {name_score}")  # 디버깅용
+            print(f"[{shard['source']}] 비교: '{product_name_clean}' vs '{inventory_name_clean}' = {name_score}")  # 디버깅용
             
             if name_score > 60:  # 임계값을 60%로 낮춤
+                # 상품별 대안 후보 갱신
+                self.add_product_candidate(products, row, seq, name_score,
+                                           self.option_rank(row['option'], search_info, search_color),
+                                           shard['source'])
+                
                 # 옵션 문자열 파싱
                 option_str = str(row['option']).strip()
                 
@@ -239,87 +552,379 @@ class OZKIZOrderSystem:
                         if name_score > best_score:
                             best_score = name_score
                             best_match = row
-                            print(f"매칭 발견! 점수: {name_score}")  # 디버깅용
+                            print(f"[{shard['source']}] 매칭 발견! 점수: {name_score}")  # 디버깅용
         
-        if best_match is None:
-            print(f"매칭 실패: {search_info}")  # 디버깅용
-        else:
-            print(f"최종 매칭: {best_match['product_name']}")  # 디버깅용
+        return best_match, best_score, self.top_products(products, top_n), timed_out
+
+    def option_rank(self, option, search_info, search_color):
+        """대안 후보 대표 행 우선순위: 0 컬러/사이즈 일치, 1 사이즈만 일치, 2 그 외"""
+        option_parts = str(option).strip().split(',')
+        if len(option_parts) < 2:
+            return 2
+        if str(search_info['size']).strip() != option_parts[1].strip().replace(':', '').strip():
+            return 2
+        return 0 if search_color.lower() == option_parts[0].strip().lower() else 1
+
+    def add_product_candidate(self, products, row, seq, name_score, rank, source):
+        """
+        상품별 대안 후보 갱신 (같은 상품명의 다른 옵션 행은 후보 하나로 묶음)
+        대표 행: 우선순위(option_rank)가 높은 행 > 먼저 나온 행
+        """
+        product_key = str(row['product_name']).strip()
+        product = products.get(product_key)
+        if product is None or rank < product[0]:
+            products[product_key] = (rank, seq if product is None else product[1], name_score, {
+                'product_code': row['product_code'],
+                'product_name': row['product_name'],
+                'option': row['option'],
+                'source': source,
+                'score': name_score
+            })
+
+    def top_products(self, products, top_n):
+        """상품별 대표 후보 중 점수 상위 N개 -> [(점수, -첫 행 순서, 후보)] (동점이면 먼저 나온 상품 우선)"""
+        return heapq.nlargest(
+            top_n,
+            ((name_score, -first_seq, cand) for _, first_seq, name_score, cand in products.values()),
+            key=lambda item: item[:2]
+        )
+
+    def match_in_db_shard(self, search_info, search_color, shard, deadline=None):
+        """
+        DB 샤드에서 최적 매칭 검색 -> (매칭 행, 점수, 상품별 후보, 시간 초과 여부)
+        xlsx 샤드(match_in_shard)와 같은 결과:
+        - 매칭: 컬러/사이즈가 같은 행만 인덱스 조회로 가져와 비교
+        - 상품별 후보: 상품명 목록만 먼저 비교한 뒤 상위 N개 상품명의 행만 조회
+        deadline을 넘기면 (상품명 비교 중에도) 결과 없이 중단
+        """
+        top_n = self.top_n_alternatives + 1
+        product_name_clean = str(search_info['product_name']).strip().lower().replace(" ", "")
+        
+        # 상품명별 점수 (같은 상품명은 한 번만 계산, deadline을 넘기면 중단)
+        name_scores = {}
+        for name in shard['names']:
+            if deadline is not None and time.monotonic() > deadline:
+                return None, 0, [], True
+            name_scores[name] = fuzz.ratio(product_name_clean, str(name).strip().lower().replace(" ", ""))
+        
+        conn = self.inventory_conn()
+        best_match = None
+        best_score = 0
+        for row in inventory_db.query_candidates(
+                conn, shard['source'], size=str(search_info['size']).strip(), color=search_color):
+            name_score = name_scores.get(row['product_name'], 0)
+            if name_score > 60 and name_score > best_score:
+                best_score = name_score
+                best_match = {**dict(row), 'source': shard['source']}
+                print(f"[{shard['source']}] 매칭 발견! 점수: {name_score}")  # 디버깅용
         
-        return best_match
+        # 대안 후보: 점수 상위 N개 상품명의 행만 조회 (상품명 목록은 시트 순서라 동점이면 먼저 나온 상품 우선)
+        top_names = heapq.nlargest(
+            top_n,
+            (name for name in shard['names'] if name_scores[name] > 60),
+            key=lambda name: name_scores[name]
+        )
+        products = {}
+        for row in inventory_db.query_by_names(conn, shard['source'], top_names):
+            self.add_product_candidate(products, row, row['row_no'], name_scores[row['product_name']],
+                                       self.option_rank(row['option'], search_info, search_color),
+                                       shard['source'])
+        
+        return best_match, best_score, self.top_products(products, top_n), False
 
     def process_orders(self):
         """주문 처리 메인 함수"""
         self.status_var.set("주문 처리 중...")
-        orders = self.order_text.get(1.0, tk.END).strip().split('\n')
         
-        if not orders or orders[0] == '':
-            messagebox.showwarning("경고", "처리할 주문이 없습니다.")
-            self.status_var.set("준비됨")
-            return
+        # 빠른 처리 모드 시간 예산
+        if self.anytime_var.get():
+            try:
+                self.line_budget_ms = max(1, int(self.budget_var.get()))
+            except ValueError:
+                messagebox.showwarning("경고", f"시간 예산은 숫자(ms)로 입력하세요. {self.line_budget_ms}ms로 처리합니다.")
+                self.budget_var.set(str(self.line_budget_ms))
         
-        results = []
+        entries = []
         current_product = None
+        line_cache = {}
+        reused_lines = 0
+        processed_lines = 0
         
-        for order in orders:
+        for order in self.iter_order_lines():
             if order.strip():
-                order_info = self.parse_order(order)
-                print(f"\nProcessing order: {order}")
+                # 라인 내용 + 적용 중인 제품군(헤더) + 처리 모드 기준으로 캐시 조회
+                # (빠른 처리 모드 결과는 대안 후보가 없으므로 일반 모드와 따로 보관)
+                line_hash = hashlib.sha1(order.encode('utf-8')).hexdigest()
+                cache_key = (line_hash, current_product, self.anytime_var.get())
+                
+                if cache_key in self.line_cache:
+                    order_info, cached_results = self.line_cache[cache_key]
+                    # 같은 라인이 여러 번 나와도 결과를 따로 수정할 수 있도록 복사해서 사용
+                    line_results = [dict(result) for result in cached_results]
+                    reused_lines += 1
+                else:
+                    order_info, line_results = self.process_order_line(order, current_product)
+                    processed_lines += 1
+                
+                # 시간 예산으로 중단된 라인은 캐시하지 않음 (다음 처리에서 다시 시도)
+                if not any(result['budget_limited'] for result in line_results):
+                    line_cache[cache_key] = (order_info, line_results)
                 
                 if not order_info['variants']:
                     current_product = order_info['product_name']
-                    print(f"New product group: {current_product}")
                     continue
                 
-                for variant in order_info['variants']:
-                    search_info = {
-                        'product_name': current_product or order_info['product_name'],
-                        'color': variant['color'],
-                        'size': variant['size']
-                    }
-                    
-                    matching_product = self.find_matching_product(search_info)
-                    
-                    if matching_product is not None:
-                        results.append({
-                            'product_code': matching_product['product_code'],
-                            'product_name': matching_product['product_name'],
-                            'color': variant['color'],
-                            'size': variant['size'],
-                            'quantity': variant['quantity']
-                        })
+                entries.extend(line_results)
+        
+        if processed_lines + reused_lines == 0:
+            messagebox.showwarning("경고", "처리할 주문이 없습니다.")
+            self.status_var.set("준비됨")
+            return
+        
+        # 이번 입력에 없는 라인은 캐시에서 제거
+        self.line_cache = line_cache
+        print(f"처리 라인: {processed_lines}, 재사용 라인: {reused_lines}")  # 디버깅용
+        
+        # 대안 선택 목록 갱신 (매칭 실패 라인도 후보가 있으면 포함)
+        self.last_entries = entries
+        self.last_output_path = None
+        self.ledger_run_id = None
+        self.update_line_picker()
+        
+        results = [entry for entry in entries if entry['product_code'] is not None]
         
         if results:
-            df = pd.DataFrame(results)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"어드민_발주서_{timestamp}.xlsx"
-            output_path = os.path.join(self.output_dir, filename)
-            df.to_excel(output_path, index=False, columns=[
-                'product_code', 'product_name', 'color', 'size', 'quantity'
-            ])
-            self.show_results(results, filename)
-            self.status_var.set(f"발주서 생성 완료: {filename}")
+            filename = self.save_order_sheet()
+            self.record_ledger(results, filename)
+            self.show_results(entries, filename)
+            limited = sum(1 for entry in entries if entry['budget_limited'])
+            self.status_var.set(f"발주서 생성 완료: {filename} "
+                                f"(처리 {processed_lines}줄, 재사용 {reused_lines}줄"
+                                + (f", 시간 예산 내 처리 {limited}건" if limited else "") + ")")
         else:
             messagebox.showwarning("경고", "매칭되는 제품을 찾을 수 없습니다.")
             self.status_var.set("준비됨")
 
+    def save_order_sheet(self):
+        """매칭된 주문으로 발주서 저장 (대안 적용시 같은 파일에 덮어쓰기) -> 파일명"""
+        if self.last_output_path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.last_output_path = os.path.join(self.output_dir, f"어드민_발주서_{timestamp}.xlsx")
+        
+        results = [entry for entry in self.last_entries if entry['product_code'] is not None]
+        df = pd.DataFrame(results)
+        df.to_excel(self.last_output_path, index=False, columns=[
+            'product_code', 'product_name', 'color', 'size', 'quantity', 'source'
+        ])
+        return os.path.basename(self.last_output_path)
+
+    def process_order_line(self, order, current_product):
+        """주문 한 줄 파싱 및 매칭 -> (파싱 결과, 결과 목록 - 매칭 실패는 product_code None)"""
+        order_info = self.parse_order(order)
+        print(f"\nProcessing order: {order}")
+        line_results = []
+        
+        if not order_info['variants']:
+            print(f"New product group: {order_info['product_name']}")
+            return order_info, line_results
+        
+        # 빠른 처리 모드: 라인 전체에 시간 예산 적용
+        deadline = None
+        if self.anytime_var.get():
+            deadline = time.monotonic() + self.line_budget_ms / 1000
+        
+        for variant in order_info['variants']:
+            search_info = {
+                'product_name': current_product or order_info['product_name'],
+                'color': variant['color'],
+                'size': variant['size']
+            }
+            
+            matching_product, alternatives, match_info = self.find_matching_product(search_info, deadline)
+            
+            if matching_product is not None:
+                line_results.append({
+                    'product_code': matching_product['product_code'],
+                    'product_name': matching_product['product_name'],
+                    'color': variant['color'],
+                    'size': variant['size'],
+                    'quantity': variant['quantity'],
+                    'source': matching_product['source'],
+                    'option': matching_product['option'],
+                    'score': match_info['score'],
+                    'alternatives': alternatives,
+                    'budget_limited': match_info['budget_limited']
+                })
+            else:
+                line_results.append({
+                    'product_code': None,
+                    'product_name': search_info['product_name'],
+                    'color': variant['color'],
+                    'size': variant['size'],
+                    'quantity': variant['quantity'],
+                    'source': '',
+                    'option': '',
+                    'score': 0,
+                    'alternatives': alternatives,
+                    'budget_limited': match_info['budget_limited']
+                })
+        
+        return order_info, line_results
+
+    def new_ledger_session_key(self):
+        """직접 입력 세션의 원장 범위 (초기화할 때마다 새 세션)"""
+        return f"gui:{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+    def record_ledger(self, rows, filename):
+        """
+        발주 이력 원장에 기록 (실패해도 발주서 생성은 유지)
+        처리할 때마다 새 실행으로 기록하고, 대안 적용 정정은 같은 실행에 추가
+        주문 식별자는 세션 + 입력 내용 해시 (내용 그대로 다시 처리할 때만 이전 실행 대체)
+        """
+        try:
+            if self.ledger_run_id is None:
+                order_key = ledger.input_order_key(self.ledger_session_key, self.iter_order_lines())
+                self.ledger_run_id = ledger.start_run(order_key, filename)
+            ledger.record_orders([
+                {
+                    'product_code': row['product_code'],
+                    'product_name': row['product_name'],
+                    'color': row['color'],
+                    'size': row['size'],
+                    'quantity': row['quantity'],
+                    'inventory_source': row['source']
+                }
+                for row in rows
+            ], self.ledger_run_id)
+        except Exception as e:
+            print(f"Error recording ledger: {str(e)}")  # 디버깅용
+
+    def format_alternative(self, candidate):
+        """대안 후보 표시 문자열"""
+        return (f"{candidate['product_code']} | {candidate['product_name']} | "
+                f"{candidate['option']} ({candidate['score']}%)")
+
+    def update_line_picker(self):
+        """
+        검토가 필요한 라인(매칭 실패 또는 낮은 점수 매칭 중 대안 후보가 있는 라인)으로
+        라인 선택 콤보박스 갱신 (번호는 처리 결과의 라인 번호, 최대 picker_display_limit줄)
+        """
+        picker_lines = [
+            (idx, entry) for idx, entry in enumerate(self.last_entries)
+            if entry['alternatives']
+            and (entry['product_code'] is None or entry['score'] < self.review_score_threshold)
+        ]
+        total_lines = len(picker_lines)
+        picker_lines = picker_lines[:self.picker_display_limit]
+        self.picker_entries = [entry for _, entry in picker_lines]
+        self.line_picker['values'] = [
+            f"{idx + 1}. {entry['product_name']} {entry['color']} {entry['size']} "
+            f"-> {entry['product_code'] if entry['product_code'] is not None else '매칭 실패'}"
+            + (f" ({entry['score']}%)" if entry['product_code'] is not None else "")
+            for idx, entry in picker_lines
+        ]
+        if total_lines > len(picker_lines):
+            self.line_picker.set(f"검토 대상 {total_lines:,}줄 중 {len(picker_lines):,}줄 표시 (나머지는 발주서 파일 참조)")
+        else:
+            self.line_picker.set('')
+        self.alt_picker['values'] = []
+        self.alt_picker.set('')
+
+    def on_line_selected(self, event=None):
+        """선택한 라인의 대안 후보 표시"""
+        idx = self.line_picker.current()
+        if idx < 0:
+            return
+        entry = self.picker_entries[idx]
+        self.alt_picker['values'] = [self.format_alternative(cand) for cand in entry['alternatives']]
+        self.alt_picker.current(0)
+
+    def apply_alternative(self):
+        """선택한 대안으로 라인의 매칭 결과를 교체하고 발주서 다시 저장"""
+        line_idx = self.line_picker.current()
+        alt_idx = self.alt_picker.current()
+        if line_idx < 0 or alt_idx < 0:
+            messagebox.showwarning("경고", "라인과 대안을 선택하세요.")
+            return
+        
+        entry = self.picker_entries[line_idx]
+        chosen = entry['alternatives'][alt_idx]
+        
+        # 원장 정정 기록: 기존 매칭은 음수 수량, 새 매칭은 양수 수량으로 추가
+        corrections = []
+        if entry['product_code'] is not None:
+            corrections.append({**entry, 'quantity': -entry['quantity']})
+        
+        # 기존 매칭은 대안 목록으로 되돌림
+        remaining = [cand for i, cand in enumerate(entry['alternatives']) if i != alt_idx]
+        if entry['product_code'] is not None:
+            remaining.insert(0, {
+                'product_code': entry['product_code'],
+                'product_name': entry['product_name'],
+                'option': entry['option'],
+                'source': entry['source'],
+                'score': entry['score']
+            })
+        
+        # 대안 후보는 옵션과 무관하게 수집되므로 컬러/사이즈도 선택한 재고 옵션으로 교체
+        option_parts = str(chosen['option']).strip().split(',')
+        if len(option_parts) >= 2:
+            entry['color'] = option_parts[0].strip()
+            entry['size'] = option_parts[1].strip().replace(':', '').strip()
+        
+        # 이번 처리 결과가 캐시에 저장되므로 같은 라인을 다시 처리해도 선택이 유지됨
+        entry.update({
+            'product_code': chosen['product_code'],
+            'product_name': chosen['product_name'],
+            'source': chosen['source'],
+            'option': chosen['option'],
+            'score': chosen['score'],
+            'alternatives': remaining
+        })
+        
+        filename = self.save_order_sheet()
+        corrections.append(entry)
+        self.record_ledger(corrections, filename)
+        self.show_results(self.last_entries, filename)
+        self.update_line_picker()
+        self.status_var.set(f"대안 적용 완료: {chosen['product_code']} -> {filename}")
+
     def show_results(self, results, filename):
-        """처리 결과를 화면에 표시"""
+        """처리 결과를 화면에 표시 (매칭 실패 라인은 대안 후보와 함께 표시)"""
         self.result_text.delete(1.0, tk.END)
         self.result_text.insert(tk.END, f"발주서 생성 완료: {filename}\n\n")
         
-        for result in results:
+        for result in results[:self.result_display_limit]:
+            if result['product_code'] is None:
+                self.result_text.insert(tk.END,
+                    f"매칭 실패: {result['product_name']} {result['color']} {result['size']}\n")
+                for cand in result['alternatives']:
+                    self.result_text.insert(tk.END, f"  대안: {self.format_alternative(cand)}\n")
+                if result['budget_limited']:
+                    self.result_text.insert(tk.END, "  [시간 예산 내 처리 - 빠른 처리 해제 후 다시 처리하면 전체 검색]\n")
+                self.result_text.insert(tk.END, "----------------------------------------\n")
+                continue
+            
             self.result_text.insert(tk.END,
                 f"SKU: {result['product_code']}\n"
                 f"제품명: {result['product_name']}\n"
                 f"색상: {result['color']}\n"
                 f"사이즈: {result['size']}\n"
                 f"수량: {result['quantity']}\n"
-                f"----------------------------------------\n"
+                f"재고출처: {result['source']}\n"
+                + ("[시간 예산 내 처리 - 일부 재고만 검색]\n" if result['budget_limited'] else "")
+                + "----------------------------------------\n"
             )
+        
+        if len(results) > self.result_display_limit:
+            self.result_text.insert(tk.END,
+                f"... 외 {len(results) - self.result_display_limit:,}건 (발주서 파일 참조)\n")
 
     def clear_all(self):
-        """입력창과 결과창 초기화"""
+        """입력창과 결과창 초기화 (직접 처리 모드 해제, 원장에는 새 세션으로 기록)"""
+        self.direct_file_path = None
+        self.ledger_session_key = self.new_ledger_session_key()
+        self.order_text.config(state=tk.NORMAL)
         self.order_text.delete(1.0, tk.END)
         self.result_text.delete(1.0, tk.END)
         self.status_var.set("준비됨")
@@ -330,7 +935,12 @@ class OZKIZOrderSystem:
 
     def run(self):
         """프로그램 실행"""
-        self.window.mainloop()
+        try:
+            self.window.mainloop()
+        finally:
+            self.shard_executor.shutdown(wait=True)
+            for conn in self.db_connections:
+                conn.close()
 
 def match_product(order_product, stock_df):
     """
@@ -5,6 +5,25 @@ import os
 import sys
 import glob
 import re
+import argparse
+from datetime import datetime
+import heapq
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import ledger
+import inventory_db
+
+# 매칭 과정 디버그 출력 여부 (--verbose)
+VERBOSE = False
+
+# 주문 라인별 대안 후보 수 (Alt_1..Alt_N)
+TOP_N_ALTERNATIVES = 3
+
+# 결과 컬럼 순서 (Alt_1..Alt_N 은 뒤에 추가)
+RESULT_COLUMNS = [
+    'Order_Product', 'Order_Color', 'Order_Size', 'Order_Quantity', 'Order_Price_35',
+    'Matched_Name', 'Matched_Code', 'Matched_Price', 'Matched_stocks', 'Matched_Option',
+    'Matched_Source', 'Similarity'
+]
 
 def read_input_file(input_file):
     file_extension = os.path.splitext(input_file)[1].lower()
@@ -43,7 +62,9 @@ def clean_product_name(name):
     return name.strip()
 
 def calculate_price_35_percent(price):
-    # 35% 가격 계산
+    # 35% 가격 계산 (Series면 컬럼 단위로 한 번에 계산)
+    if isinstance(price, pd.Series):
+        return (price.astype(float) * 0.35).astype(int)
     return int(price * 0.35)
 
 def get_input_files():
@@ -135,7 +156,8 @@ def calculate_similarity(order_name, inventory_name):
     _, inv_full_name = split_product_name(inventory_name)
     inv_core_name = extract_core_product_name(inv_full_name).lower()
     
-    print(f"핵심 이름 비교: '{order_core_name}' vs '{inv_core_name}'")  # 디버깅용
+    if VERBOSE:
+        print(f"핵심 이름 비교: '{order_core_name}' vs '{inv_core_name}'")  # 디버깅용
     
     # 핵심 이름 유사도 계산
     name_similarity = fuzz.ratio(order_core_name, inv_core_name)
@@ -246,97 +268,324 @@ def normalize_option(option_str, ignore_color=False):
     
     return option
 
-def process_orders(input_file, inventory_file):
-    """주문 처리 함수"""
-    orders = read_input_file(input_file)
-    inventory = pd.read_excel(inventory_file)
-    results = []
-    
-    for _, order in orders.iterrows():
-        best_match = None
-        best_score = 0
+def get_inventory_files(database_dir='database'):
+    """database 폴더의 재고 시트(샤드) 목록 반환 (창고/브랜드별 xlsx)"""
+    files = sorted(
+        f for f in glob.glob(os.path.join(database_dir, '*.xlsx'))
+        if not os.path.basename(f).startswith('~$')  # 엑셀 임시 파일 제외
+    )
+    return files
+
+def set_verbose(verbose):
+    """디버그 출력 여부 설정 (샤드 조회 작업 프로세스 초기화용)"""
+    global VERBOSE
+    VERBOSE = verbose
+
+def load_inventory_shard(inventory_file):
+    """
+    재고 샤드 하나를 읽고 독립적인 인덱스 생성 (실패시 None)
+    - colors_by_name: 상품명별 컬러 집합 (단일 컬러 제품 판별용)
+    """
+    try:
+        inventory = pd.read_excel(inventory_file)
         
-        order_product = str(order['Product']).strip()
-        order_color = str(order['Color']).strip()
-        order_size = str(order['Size']).strip()
+        colors_by_name = {}
+        for inv_name, opt in zip(inventory['상품명'], inventory['옵션']):
+            opt = str(opt)
+            color = opt.split(',')[0].strip() if ',' in opt else ''
+            colors_by_name.setdefault(inv_name, set()).add(color)
         
-        print(f"\n처리 중인 주문: {order_product}")
-        print(f"옵션: {order_color}, {order_size}")
+        return {
+            'source': os.path.splitext(os.path.basename(inventory_file))[0],
+            'inventory': inventory,
+            'colors_by_name': colors_by_name
+        }
+    except Exception as e:
+        print(f"재고 파일 로드 실패 (건너뜀): {inventory_file} - {str(e)}")
+        return None
+
+def add_product_candidate(products, inv, seq, similarity, expected_option, source):
+    """
+    상품별 대안 후보 갱신 (같은 상품명의 다른 옵션 행은 후보 하나로 묶음)
+    대표 행: 주문 옵션과 같은 행 > 사이즈가 같은 행 > 먼저 나온 행
+    """
+    inv_option = str(inv['옵션'])
+    if normalize_option(inv_option) == normalize_option(expected_option):
+        rank = 0
+    elif normalize_option(inv_option, ignore_color=True) == normalize_option(expected_option, ignore_color=True):
+        rank = 1
+    else:
+        rank = 2
+    
+    inv_name = str(inv['상품명']).strip()
+    product = products.get(inv_name)
+    if product is None or rank < product[0]:
+        products[inv_name] = (rank, seq if product is None else product[1], similarity, {
+            'code': inv['상품코드'],
+            'name': inv['상품명'],
+            'option': inv['옵션'],
+            'score': similarity,
+            'source': source
+        })
+
+def top_products(products, top_n):
+    """상품별 대표 후보 중 유사도 상위 top_n개 -> [(유사도, -첫 행 순서, 후보)] (동점이면 먼저 나온 상품 우선)"""
+    return heapq.nlargest(
+        max(top_n, 0),
+        ((similarity, -first_seq, cand) for _, first_seq, similarity, cand in products.values()),
+        key=lambda item: item[:2]
+    )
+
+def match_order_in_db_shard(order_product, order_color, order_size, shard, top_n, conn):
+    """
+    DB 샤드에서 주문 상품의 최적 매칭 검색 -> (매칭 행, 유사도, 상품별 후보)
+    xlsx 샤드(match_order_in_shard)와 같은 결과:
+    - 매칭: 옵션 조건(사이즈 + 컬러 또는 단일 컬러 제품)을 인덱스 조회로 먼저 거른 행만 비교
+    - 상품별 후보: 상품명 목록만 유사도 비교한 뒤 상위 top_n개 상품명의 행만 조회
+    """
+    expected_option = f"{order_color}, :{order_size}"
+    color_key, size_key = normalize_option(expected_option).split(',', 1)
+    
+    # 상품명별 유사도 (같은 상품명은 한 번만 계산)
+    name_scores = {}
+    for name in shard['names']:
+        name_scores[str(name).strip()] = calculate_similarity(order_product, str(name).strip())
+    
+    def to_inventory_row(row):
+        return {
+            '상품코드': row['product_code'],
+            '상품명': row['product_name'],
+            '옵션': row['option'],
+            '판매가': row['price'],
+            '가용재고': row['available_stock']
+        }
+    
+    best_match = None
+    best_score = 0
+    for row in inventory_db.query_options(conn, shard['source'], size_key, color_key):
+        inv_name = str(row['product_name']).strip()
+        if inv_name not in name_scores:
+            name_scores[inv_name] = calculate_similarity(order_product, inv_name)
+        similarity = name_scores[inv_name]
+        
+        if similarity >= 60 and similarity > best_score:
+            best_score = similarity
+            best_match = to_inventory_row(row)
+            if VERBOSE:
+                print(f"[{shard['source']}] 매칭 성공! 상품코드: {row['product_code']}")
+                print(f"매칭된 옵션: {row['option']}")
+    
+    # 대안 후보: 유사도 상위 top_n개 상품명의 행만 조회 (상품명 목록은 시트 순서라 동점이면 먼저 나온 상품 우선)
+    top_names = heapq.nlargest(
+        max(top_n, 0),
+        (name for name in shard['names'] if name_scores[str(name).strip()] >= 60),
+        key=lambda name: name_scores[str(name).strip()]
+    )
+    products = {}
+    for row in inventory_db.query_by_names(conn, shard['source'], top_names):
+        add_product_candidate(products, to_inventory_row(row), row['row_no'],
+                              name_scores[str(row['product_name']).strip()], expected_option, shard['source'])
+    
+    return best_match, best_score, top_products(products, top_n)
+
+def match_order_in_shard(order_product, order_color, order_size, shard, top_n=TOP_N_ALTERNATIVES):
+    """
+    샤드 하나에서 주문 상품의 최적 매칭 검색 -> (매칭 행, 유사도, 상품별 후보)
+    상품별 후보: 옵션과 무관하게 제품명 유사도 상위 top_n개 상품 (같은 스캔에서 수집,
+                 같은 상품의 다른 옵션은 주문 옵션에 가장 가까운 행 하나로 묶음)
+    """
+    best_match = None
+    best_score = 0
+    products = {}  # 상품명별 대표 후보
+    name_scores = {}  # 상품명별 유사도 (같은 상품명은 한 번만 계산)
+    expected_option = f"{order_color}, :{order_size}"
+    
+    for seq, (_, inv) in enumerate(shard['inventory'].iterrows()):
+        inv_name = str(inv['상품명']).strip()
+        if inv_name not in name_scores:
+            name_scores[inv_name] = calculate_similarity(order_product, inv_name)
+        similarity = name_scores[inv_name]
         
-        # 제품명 매칭
-        for _, inv in inventory.iterrows():
-            inv_name = str(inv['상품명']).strip()
-            similarity = calculate_similarity(order_product, inv_name)
+        if similarity >= 60:  # 60% 이상 유사도
+            add_product_candidate(products, inv, seq, similarity, expected_option, shard['source'])
             
-            if similarity >= 60:  # 60% 이상 유사도
-                print(f"제품명 매칭 (유사도 {similarity:.1f}%): {inv_name}")
-                
-                # 옵션 매칭 시도 (먼저 컬러 포함해서 시도)
-                inv_option = str(inv['옵션'])
-                expected_option = f"{order_color}, :{order_size}"
-                
-                # 1차 시도: 컬러와 사이즈 모두 매칭
-                inv_option_norm = normalize_option(inv_option)
-                expected_option_norm = normalize_option(expected_option)
-                
-                match_found = inv_option_norm == expected_option_norm
-                
-                # 컬러 매칭 실패시, 해당 제품의 컬러가 1가지인지 확인
-                if not match_found:
-                    # 현재 제품의 모든 옵션 가져오기
-                    product_options = inventory[inventory['상품명'] == inv_name]['옵션'].unique()
-                    unique_colors = set()
-                    
-                    # 해당 제품의 모든 컬러 수집
-                    for opt in product_options:
-                        color = opt.split(',')[0].strip() if ',' in opt else ''
-                        unique_colors.add(color)
-                    
-                    # 컬러가 1가지만 있는 경우
-                    if len(unique_colors) == 1:
-                        # 사이즈만으로 매칭 시도
-                        inv_option_norm = normalize_option(inv_option, ignore_color=True)
-                        expected_option_norm = normalize_option(expected_option, ignore_color=True)
-                        match_found = inv_option_norm == expected_option_norm
+            if VERBOSE:
+                print(f"[{shard['source']}] 제품명 매칭 (유사도 {similarity:.1f}%): {inv_name}")
+            
+            # 옵션 매칭 시도 (먼저 컬러 포함해서 시도)
+            inv_option = str(inv['옵션'])
+            
+            # 1차 시도: 컬러와 사이즈 모두 매칭
+            inv_option_norm = normalize_option(inv_option)
+            expected_option_norm = normalize_option(expected_option)
+            
+            match_found = inv_option_norm == expected_option_norm
+            
+            # 컬러 매칭 실패시, 해당 제품의 컬러가 1가지인지 확인 (샤드 인덱스 사용)
+            if not match_found:
+                color_count = len(shard['colors_by_name'].get(inv['상품명'], set()))
                 
-                if match_found:
-                    if similarity > best_score:
-                        best_score = similarity
-                        best_match = inv
-                        print(f"매칭 성공! 상품코드: {inv['상품코드']}")
+                # 컬러가 1가지만 있는 경우
+                if color_count == 1:
+                    # 사이즈만으로 매칭 시도
+                    inv_option_norm = normalize_option(inv_option, ignore_color=True)
+                    expected_option_norm = normalize_option(expected_option, ignore_color=True)
+                    match_found = inv_option_norm == expected_option_norm
+            
+            if match_found:
+                if similarity > best_score:
+                    best_score = similarity
+                    best_match = inv
+                    if VERBOSE:
+                        print(f"[{shard['source']}] 매칭 성공! 상품코드: {inv['상품코드']}")
                         print(f"매칭된 옵션: {inv_option}")
+    
+    return best_match, best_score, top_products(products, top_n)
+
+def match_orders_in_shard(order_keys, shard, top_n=TOP_N_ALTERNATIVES):
+    """샤드 하나에서 모든 주문 라인 매칭 (샤드 단위 병렬 작업)"""
+    if 'db_path' not in shard:
+        return [match_order_in_shard(product, color, size, shard, top_n)
+                for product, color, size in order_keys]
+    
+    # DB 샤드: 작업마다 읽기 전용 연결 하나, 상품명 목록은 한 번만 조회
+    conn = inventory_db.connect(shard['db_path'])
+    try:
+        shard = {**shard, 'names': inventory_db.list_product_names(conn, shard['source'])}
+        return [match_order_in_db_shard(product, color, size, shard, top_n, conn)
+                for product, color, size in order_keys]
+    finally:
+        conn.close()
+
+def format_alternative(candidate):
+    """대안 후보를 결과 컬럼용 문자열로 변환"""
+    return (f"{candidate['code']} | {candidate['name']} | {candidate['option']} "
+            f"({candidate['score']:.0f}%)")
+
+def load_db_shards(inventory_files, db_path=None):
+    """재고 DB 샤드 목록 (재고 시트가 바뀐 경우에만 DB 재생성, 아니면 xlsx 파싱 생략)"""
+    db_path = db_path or inventory_db.DB_PATH
+    inventory_db.ensure_inventory_db(inventory_files, db_path)
+    if not os.path.exists(db_path):
+        return []
+    
+    conn = inventory_db.connect(db_path)
+    try:
+        return [{'source': shard, 'db_path': db_path} for shard in inventory_db.list_shards(conn)]
+    finally:
+        conn.close()
+
+def process_orders(input_file, inventory_files, top_n=TOP_N_ALTERNATIVES, backend='xlsx'):
+    """
+    주문 처리 함수
+    inventory_files: 재고 파일 경로 또는 경로 목록 (샤드별로 병렬 조회 후 최고 점수 선택)
+    top_n: 주문 라인별 대안 후보 수 (Alt_1..Alt_N 컬럼)
+    backend: 'xlsx' (메모리 DataFrame) 또는 'sqlite' (database/inventory.db 인덱스 조회)
+    """
+    if isinstance(inventory_files, str):
+        inventory_files = [inventory_files]
+    
+    orders = read_input_file(input_file)
+    
+    # 작업 수는 CPU 수 이내 (샤드가 많아도 프로세스/스레드를 샤드마다 만들지 않음)
+    max_workers = os.cpu_count() or 1
+    
+    if backend == 'sqlite':
+        shards = load_db_shards(inventory_files)
+    elif inventory_files:
+        # 샤드별 로드 및 인덱스 생성 (병렬)
+        with ThreadPoolExecutor(max_workers=min(len(inventory_files), max_workers)) as executor:
+            shards = [shard for shard in executor.map(load_inventory_shard, inventory_files)
+                      if shard is not None]
+    else:
+        shards = []
+    
+    if not shards:
+        print("사용할 수 있는 재고 파일이 없습니다. 모든 주문이 매칭 실패로 처리됩니다.")
+    
+    # 주문 컬럼 정리 (컬럼 단위)
+    order_products = orders['Product'].astype(str).str.strip()
+    order_colors = orders['Color'].astype(str).str.strip()
+    order_sizes = orders['Size'].astype(str).str.strip()
+    order_keys = list(zip(order_products, order_colors, order_sizes))
+    
+    # 샤드별 병렬 조회 - 퍼지 비교는 CPU 작업이므로 샤드마다 별도 프로세스
+    # (선택된 매칭과 같은 상품이 후보에서 빠질 수 있으므로 샤드별 상품 후보는 1개 더 수집)
+    shard_results = []
+    if shards:
+        with ProcessPoolExecutor(max_workers=min(len(shards), max_workers), initializer=set_verbose,
+                                 initargs=(VERBOSE,)) as executor:
+            shard_results = list(executor.map(
+                match_orders_in_shard,
+                [order_keys] * len(shards), shards, [top_n + 1] * len(shards)))
+    
+    # 결과 컬럼 미리 할당 (기본값: 매칭 실패)
+    n = len(order_keys)
+    matched_name = np.full(n, '매칭 실패', dtype=object)
+    matched_code = np.full(n, '매칭 실패', dtype=object)
+    matched_price = np.zeros(n, dtype=object)
+    matched_stocks = np.zeros(n, dtype=object)
+    matched_option = np.full(n, '', dtype=object)
+    matched_source = np.full(n, '', dtype=object)
+    similarity = np.zeros(n, dtype=np.int64)
+    alternatives = np.full((n, top_n), '', dtype=object)
+    
+    for idx in range(n):
+        # 샤드 간 최고 점수 선택 (동점이면 앞쪽 샤드 우선)
+        best_match = None
+        best_score = 0
+        best_source = ''
+        shard_candidates = []
+        for shard_idx, (shard, matches) in enumerate(zip(shards, shard_results)):
+            match, score, candidates = matches[idx]
+            if match is not None and score > best_score:
+                best_match, best_score, best_source = match, score, shard['source']
+            shard_candidates.extend(
+                (cand_score, -shard_idx, neg_seq, cand) for cand_score, neg_seq, cand in candidates)
+        
+        # 샤드별 상품 후보 병합 (선택된 매칭과 같은 상품은 제외)
+        shard_candidates.sort(key=lambda item: item[:3], reverse=True)
+        alt_idx = 0
+        for _, _, _, cand in shard_candidates:
+            if alt_idx >= top_n:
+                break
+            if (best_match is not None and cand['source'] == best_source
+                    and str(cand['name']).strip() == str(best_match['상품명']).strip()):
+                continue
+            alternatives[idx, alt_idx] = format_alternative(cand)
+            alt_idx += 1
         
-        # 결과 저장
         if best_match is not None:
-            results.append({
-                'Order_Product': order_product,
-                'Order_Color': order_color,
-                'Order_Size': order_size,
-                'Order_Quantity': order['Quantity'],
-                'Order_Price_35': calculate_price_35_percent(best_match['판매가']),
-                'Matched_Name': best_match['상품명'],
-                'Matched_Code': best_match['상품코드'],
-                'Matched_Price': best_match['판매가'],
-                'Matched_stocks': best_match['가용재고'],
-                'Matched_Option': best_match['옵션'],
-                'Similarity': best_score
-            })
-        else:
-            results.append({
-                'Order_Product': order_product,
-                'Order_Color': order_color,
-                'Order_Size': order_size,
-                'Order_Quantity': order['Quantity'],
-                'Order_Price_35': 0,
-                'Matched_Name': '매칭 실패',
-                'Matched_Code': '매칭 실패',
-                'Matched_Price': 0,
-                'Matched_stocks': 0,
-                'Matched_Option': '',
-                'Similarity': 0
-            })
-    
-    return pd.DataFrame(results)
+            matched_name[idx] = best_match['상품명']
+            matched_code[idx] = best_match['상품코드']
+            matched_price[idx] = best_match['판매가']
+            matched_stocks[idx] = best_match['가용재고']
+            matched_option[idx] = best_match['옵션']
+            matched_source[idx] = best_source
+            similarity[idx] = best_score
+    
+    results = pd.DataFrame({
+        'Order_Product': order_products.to_numpy(),
+        'Order_Color': order_colors.to_numpy(),
+        'Order_Size': order_sizes.to_numpy(),
+        'Order_Quantity': orders['Quantity'].to_numpy(),
+        'Matched_Name': matched_name,
+        'Matched_Code': matched_code,
+        'Matched_Price': matched_price,
+        'Matched_stocks': matched_stocks,
+        'Matched_Option': matched_option,
+        'Matched_Source': matched_source,
+        'Similarity': similarity
+    })
+    
+    # 파생 컬럼 일괄 계산 (매칭 실패 행은 판매가 0 -> 0원)
+    results['Order_Price_35'] = calculate_price_35_percent(results['Matched_Price'])
+    
+    alt_columns = [f'Alt_{i + 1}' for i in range(top_n)]
+    for i, column in enumerate(alt_columns):
+        results[column] = alternatives[:, i]
+    
+    return results[RESULT_COLUMNS + alt_columns]
 
 def match_product(product_name, size, color=None):
     # 기존 코드...
@@ -370,10 +619,57 @@ def preprocess_data(df):
     
     return df
 
+def print_summary(results):
+    """매칭 결과 요약 출력"""
+    matched = results['Matched_Code'] != '매칭 실패'
+    print("\n=== 매칭 결과 요약 ===")
+    print(f"전체 주문: {len(results)}건")
+    print(f"매칭 성공: {int(matched.sum())}건")
+    print(f"매칭 실패: {int((~matched).sum())}건")
+    print(f"총 수량: {results.loc[matched, 'Order_Quantity'].sum()}개")
+    print(f"35% 가격 합계: {int((results['Order_Price_35'] * results['Order_Quantity']).sum()):,}원")
+    
+    if matched.any():
+        print("\n재고출처별 매칭:")
+        for source, count in results.loc[matched, 'Matched_Source'].value_counts().items():
+            print(f"  {source}: {count}건")
+    
+    if (~matched).any():
+        print("\n매칭 실패 주문:")
+        columns = ['Order_Product', 'Order_Color', 'Order_Size']
+        if 'Alt_1' in results.columns:
+            columns.append('Alt_1')  # 가장 가까운 대안 후보
+        print(results.loc[~matched, columns].to_string())
+
+def print_report(results, page_size=50):
+    """매칭 결과 전체를 페이지 단위로 출력 (터미널이면 페이지마다 Enter 대기)"""
+    print("\n=== 매칭 결과 ===")
+    total = len(results)
+    for start in range(0, total, page_size):
+        end = min(start + page_size, total)
+        print(results.iloc[start:end].to_string())
+        if end < total:
+            print(f"-- {end}/{total} --")
+            if sys.stdin.isatty():
+                if input("Enter: 다음 페이지, q: 중단 ").lower() == 'q':
+                    break
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OZKIZ 주문 매칭")
+    parser.add_argument('input_file', nargs='?', help="주문 파일 (생략시 orders 폴더에서 선택)")
+    parser.add_argument('--report', action='store_true', help="요약 대신 전체 결과를 페이지 단위로 출력")
+    parser.add_argument('--page-size', type=int, default=50, help="페이지당 출력 행 수")
+    parser.add_argument('--alternatives', type=int, default=TOP_N_ALTERNATIVES,
+                        help="주문 라인별 대안 후보 수 (Alt_1..Alt_N 컬럼)")
+    parser.add_argument('--backend', choices=['xlsx', 'sqlite'], default='xlsx',
+                        help="재고 조회 방식 (sqlite: database/inventory.db 인덱스 조회)")
+    parser.add_argument('--verbose', action='store_true', help="매칭 과정 디버그 출력")
+    args = parser.parse_args()
+    VERBOSE = args.verbose
+    
     # 명령줄 인자로 파일을 지정한 경우
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
+    if args.input_file:
+        input_file = args.input_file
         if not os.path.exists(input_file):
             print(f"파일을 찾을 수 없습니다: {input_file}")
             sys.exit(1)
@@ -381,7 +677,9 @@ if __name__ == "__main__":
         # 파일 선택 메뉴 표시
         input_file = get_input_files()
     
-    inventory_file = 'database/현재고조회.xlsx'
+    # 재고 샤드 목록 (database 폴더의 모든 xlsx, 없으면 기존 단일 파일)
+    inventory_files = get_inventory_files() or ['database/현재고조회.xlsx']
+    print(f"재고 샤드 {len(inventory_files)}개: {', '.join(inventory_files)}")
     
     # 입력 파일명에서 확장자를 제외한 이름 추출
     base_name = os.path.splitext(os.path.basename(input_file))[0]
@@ -392,38 +690,51 @@ if __name__ == "__main__":
     
     # 주문 처리
     print(f"\n'{input_file}' 파일 처리 중...")
-    results = process_orders(input_file, inventory_file)
+    results = process_orders(input_file, inventory_files, args.alternatives, args.backend)
     
-    # 결과 출력
-    print("\n=== 매칭 결과 ===")
-    for idx, row in results.iterrows():
-        print(f"\n[주문 {idx + 1}]")
-        print(f"주문상품: {row['Order_Product']}")
-        print(f"주문옵션: {row['Order_Color']}, {row['Order_Size']}")
-        print(f"주문수량: {row['Order_Quantity']}개")
-        print(f"35% 가격: {row['Order_Price_35']:,}원")
-        print(f"매칭상품: {row['Matched_Name']}")
-        print(f"상품코드: {row['Matched_Code']}")
-        print(f"판매가격: {row['Matched_Price']:,}원")
-        print(f"가용재고: {row['Matched_stocks']}개")
-        print(f"매칭옵션: {row['Matched_Option']}")
-        print("-" * 50)
+    # 결과 출력 (기본: 요약)
+    if args.report:
+        print_report(results, args.page_size)
+    else:
+        print_summary(results)
     
     # 결과 파일 저장 (입력 파일명 기준으로 출력 파일명 생성)
     output_csv = f'output/{base_name}_results.csv'
     output_excel = f'output/{base_name}_results.xlsx'
     
-    # 열 순서 지정
-    column_order = [
-        'Order_Product', 'Order_Color', 'Order_Size', 'Order_Quantity', 'Order_Price_35',
-        'Matched_Name', 'Matched_Code', 'Matched_Price', 'Matched_stocks', 'Matched_Option', 'Similarity'
-    ]
-    results = results[column_order]
-    
     # UTF-8 with BOM으로 저장하여 한글이 깨지지 않도록 함
     results.to_csv(output_csv, index=False, encoding='utf-8-sig')
     results.to_excel(output_excel, index=False)
     
+    # 발주 이력 원장에 기록 (매칭 성공 주문만)
+    # 같은 파일을 내용 그대로 다시 처리하면 새 실행으로 기록되고 집계에는 최신 실행만 반영됨
+    # (파일명이 같아도 내용이 다르면 별도 주문)
+    matched = results[results['Matched_Code'] != '매칭 실패']
+    try:
+        with open(input_file, 'rb') as file:
+            order_key = ledger.input_order_key(
+                f"results:{base_name}", iter(lambda: file.read(1 << 16), b''))
+        run_started = datetime.now()
+        run_id = ledger.start_run(
+            order_key,
+            f"{os.path.basename(output_excel)}@{run_started.strftime('%Y%m%d_%H%M%S')}",
+            run_started
+        )
+        ledger.record_orders([
+            {
+                'product_code': row['Matched_Code'],
+                'product_name': row['Matched_Name'],
+                'color': row['Order_Color'],
+                'size': row['Order_Size'],
+                'quantity': row['Order_Quantity'],
+                'price': row['Matched_Price'],
+                'inventory_source': row['Matched_Source']
+            }
+            for row in matched.to_dict('records')
+        ], run_id, run_started)
+    except Exception as e:
+        print(f"원장 기록 실패: {str(e)}")
+    
     print(f"\n결과가 저장되었습니다:")
     print(f"CSV 파일: {output_csv}")
     print(f"Excel 파일: {output_excel}") 
\ No newline at end of file